@@ -1,13 +1,22 @@
 import os
 import io
 import json
+import orjson
+import queue
 import secrets
+import sqlite3
+import tempfile
+import threading
+import time
 import numpy as np
+from collections import OrderedDict
+from contextlib import closing
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from functools import lru_cache
 from flask import Flask, render_template, request, jsonify, session, redirect, url_for, Response, stream_with_context, send_file
 from tensorflow.keras.models import load_model
-from tensorflow.keras.applications.mobilenet_v2 import preprocess_input
-from PIL import Image
+from PIL import Image, UnidentifiedImageError
 import tensorflow as tf
 from groq import Groq
 from dotenv import load_dotenv
@@ -15,6 +24,9 @@ import requests
 
 # Import the enhanced report generator
 from report_generator import generate_enhanced_report
+# Shared with convert_to_tflite.py so calibration matches serving
+import preprocessing
+from preprocessing import IMG_SIZE
 
 load_dotenv()
 
@@ -26,41 +38,162 @@ app.secret_key = secrets.token_hex(16)
 
 # Configuration
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-UPLOAD_FOLDER = os.path.join(BASE_DIR, 'uploads')
 STATIC_FOLDER = os.path.join(BASE_DIR, 'static', 'images')
 MODEL_PATH = os.path.join(BASE_DIR, 'mobilenetv2_best.keras')
+TFLITE_MODEL_PATH = os.path.join(BASE_DIR, 'mobilenetv2_int8.tflite')
+SAVED_MODEL_PATH = os.path.join(BASE_DIR, 'mobilenetv2_sm')
 CLASS_NAMES_PATH = os.path.join(BASE_DIR, 'class_names.json')
-IMG_SIZE = (224, 224)
+# Channels-last (NHWC): the native layout of the XNNPACK and oneDNN CPU kernels
+INPUT_SHAPE = (1, *IMG_SIZE, 3)
+JPEG_MAGIC = b'\xff\xd8\xff'
+# JPEG header segments kept when publishing an upload: APP0 (JFIF) and APP14 (Adobe colour
+# transform). Every other APPn (EXIF/GPS, XMP, MPF, maker notes...) and COM is dropped.
+JPEG_KEPT_APP_MARKERS = (0xE0, 0xEE)
+# Same limit the original PIL path enforced: PIL raises DecompressionBombError above
+# twice Image.MAX_IMAGE_PIXELS (~179 MP)
+MAX_IMAGE_PIXELS = 2 * Image.MAX_IMAGE_PIXELS
+# Threads per process for inference; gunicorn.conf.py splits the cores between workers
+INFERENCE_THREADS = int(os.environ.get('INFERENCE_THREADS', os.cpu_count() or 1))
+
+# Must run before the TF runtime starts, so workers don't oversubscribe the CPU
+tf.config.threading.set_intra_op_parallelism_threads(INFERENCE_THREADS)
+tf.config.threading.set_inter_op_parallelism_threads(1)
 
-app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 app.config['STATIC_FOLDER'] = STATIC_FOLDER
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024 
 
 # Create directories
-os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 os.makedirs(STATIC_FOLDER, exist_ok=True)
 
+# ─── SERVER-SIDE STORES (Only a short token travels in the session cookie) ──
+class TokenStore:
+    """Thread-safe LRU of values keyed by random URL-safe tokens, with optional expiry.
+
+    With a TTL, entries stay in insertion (= expiry) order so expired ones are purged from
+    the front on every add instead of lingering until evicted.
+    """
+
+    def __init__(self, maxsize, ttl=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, value):
+        token = secrets.token_urlsafe(12)
+        expires = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            if self.ttl:
+                now = time.monotonic()
+                while self._items and next(iter(self._items.values()))[0] < now:
+                    self._items.popitem(last=False)
+            self._items[token] = (expires, value)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+        return token
+
+    def get(self, token):
+        if token is None:
+            return None
+        with self._lock:
+            entry = self._items.get(token)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires is not None and expires < time.monotonic():
+                del self._items[token]
+                return None
+            if expires is None:
+                self._items.move_to_end(token)
+            return value
+
+    def pop(self, token):
+        with self._lock:
+            entry = self._items.pop(token, None)
+        return entry[1] if entry is not None else None
+
+# In-process: the app must run as a single worker process (see README "Deployment constraints")
+PREDICTIONS = TokenStore(maxsize=4096, ttl=3600)
+
+def get_session_prediction():
+    return PREDICTIONS.get(session.get('pred_tok'))
+
 # Load model and class names globally
 model = None
+graph_infer = None
+interpreters = {}
 class_names = []
+class_meta = []
 
 def load_model_and_classes():
-    global model, class_names
+    global model, graph_infer, interpreters, class_names, class_meta
+    model_fn = None
     try:
-        model = load_model(MODEL_PATH)
-        print("Model loaded successfully")
+        if os.path.exists(TFLITE_MODEL_PATH):
+            # INT8 model produced by convert_to_tflite.py; runs on XNNPACK int8 kernels.
+            # One interpreter per padded batch size, so batching never reallocates tensors.
+            interpreters = {size: _build_interpreter(size) for size in BATCH_SIZES}
+            print(f"TFLite INT8 model loaded successfully (batch sizes {BATCH_SIZES})")
+        elif os.path.exists(SAVED_MODEL_PATH):
+            # SavedModel produced by export_saved_model.py, XLA-compiled so the conv/BN/ReLU6 chain is fused
+            model = tf.saved_model.load(SAVED_MODEL_PATH)
+            serve = model.signatures['serving_default']
+            input_name = next(iter(serve.structured_input_signature[1]))
+            model_fn = lambda x: next(iter(serve(**{input_name: x}).values()))
+            print("SavedModel loaded successfully")
+        else:
+            keras_model = model = load_model(MODEL_PATH)
+            model_fn = lambda x: keras_model(x, training=False)
+            print("Model loaded successfully")
+        if model_fn is not None:
+            graph_infer = tf.function(model_fn, jit_compile=True)
     except Exception as e:
         print(f"Error loading model: {e}")
         model = None
+        graph_infer = None
+        interpreters = {}
 
     try:
         with open(CLASS_NAMES_PATH, 'r') as f:
             class_names = json.load(f)
+        class_meta = [parse_class_name(c) for c in class_names]
         print(f"Loaded {len(class_names)} class names")
     except Exception as e:
         print(f"Error loading class names: {e}")
 
+    if model is not None or interpreters:
+        try:
+            warm_up_model()
+        except Exception as e:
+            print(f"Error warming up model: {e}")
+            if model_fn is not None:
+                # Most likely an XLA/JIT problem (unsupported op, TF build without CPU JIT):
+                # a plain graph still serves predictions, just without the fused kernels
+                graph_infer = tf.function(model_fn)
+                try:
+                    warm_up_model()
+                    print("Serving without XLA")
+                    return
+                except Exception as e:
+                    print(f"Error warming up model without XLA: {e}")
+            # Serve "Model not loaded" errors instead of crashing
+            model = None
+            graph_infer = None
+            interpreters = {}
+
 # ─── THE DYNAMIC DISSECTOR (Handles Millions of Leaves) ─────────────────────
+# First match wins: specific pathogen names before the generic "spot" symptom
+CATEGORY_RULES = (
+    ("bacterial", "Bacterial Pathogen"),
+    ("virus", "Viral Pathogen"),
+    ("mosaic", "Viral Pathogen"),
+    ("rust", "Fungal Pathogen"),
+    ("blight", "Fungal Pathogen"),
+    ("scab", "Fungal Pathogen"),
+    ("spot", "Bacterial Pathogen"),
+)
+
+@lru_cache(maxsize=4096)
 def parse_class_name(raw_class):
     """Dissects names to infer biological categories at runtime."""
     parts = raw_class.split('___')
@@ -69,71 +202,184 @@ def parse_class_name(raw_class):
     
     cond_lower = condition.lower()
     if "healthy" in cond_lower:
-        category = "Healthy Tissue"
-        is_healthy = True
-    elif "bacterial" in cond_lower or "spot" in cond_lower:
-        category = "Bacterial Pathogen"
-        is_healthy = False
-    elif "virus" in cond_lower or "mosaic" in cond_lower:
-        category = "Viral Pathogen"
-        is_healthy = False
-    elif "rust" in cond_lower or "blight" in cond_lower or "scab" in cond_lower:
-        category = "Fungal Pathogen"
-        is_healthy = False
-    else:
-        category = "General Pathogen"
-        is_healthy = False
-        
-    return plant, condition, category, is_healthy
+        return plant, condition, "Healthy Tissue", True
+    for token, category in CATEGORY_RULES:
+        if token in cond_lower:
+            return plant, condition, category, False
+    return plant, condition, "General Pathogen", False
+
+def _build_interpreter(batch_size):
+    """Returns (interpreter, input_details, output_details) allocated for a fixed batch size."""
+    interpreter = tf.lite.Interpreter(model_path=TFLITE_MODEL_PATH, num_threads=INFERENCE_THREADS)
+    input_details = interpreter.get_input_details()[0]
+    if tuple(input_details['shape']) != INPUT_SHAPE:
+        raise ValueError(f"Expected NHWC input {INPUT_SHAPE}, got {tuple(input_details['shape'])}")
+    if batch_size != INPUT_SHAPE[0]:
+        interpreter.resize_tensor_input(input_details['index'], [batch_size, *INPUT_SHAPE[1:]])
+    interpreter.allocate_tensors()
+    return interpreter, interpreter.get_input_details()[0], interpreter.get_output_details()[0]
+
+def padded_batch_size(n):
+    """Rounds a batch up to a power of two so only BATCH_SIZES shapes ever reach the model."""
+    return 1 << (n - 1).bit_length()
+
+def run_inference(img_array):
+    """Runs a preprocessed batch through the INT8 interpreter, or the compiled graph (XLA when available) as fallback.
+
+    The float32 batch is used as scratch space for quantization and may be overwritten.
+    """
+    # XLA compiles, and each interpreter is allocated, for one input shape: pad to it
+    n = img_array.shape[0]
+    padded = padded_batch_size(n)
+    if padded != n:
+        img_array = np.concatenate([img_array, np.zeros((padded - n, *INPUT_SHAPE[1:]), dtype=np.float32)])
+
+    if not interpreters:
+        return graph_infer(tf.constant(img_array)).numpy()[:n]
+
+    interpreter, input_details, output_details = interpreters[padded]
+    scale, zero_point = input_details['quantization']
+    if input_details['dtype'] == np.int8:
+        np.multiply(img_array, 1.0 / scale, out=img_array)
+        np.add(img_array, zero_point, out=img_array)
+        np.rint(img_array, out=img_array)
+        np.clip(img_array, -128, 127, out=img_array)
+        img_array = img_array.astype(np.int8)
+    interpreter.set_tensor(input_details['index'], img_array)
+    interpreter.invoke()
+    predictions = interpreter.get_tensor(output_details['index'])
+
+    scale, zero_point = output_details['quantization']
+    if output_details['dtype'] == np.int8:
+        predictions = (predictions.astype(np.float32) - zero_point) * scale
+    return predictions[:n]
+
+# ─── MICRO-BATCHING (Coalesces concurrent /predict calls) ──────────────────
+BATCH_SIZE = 16
+BATCH_WAIT = 0.005  # seconds to wait for more requests after the first arrives
+# Padded batch shapes the model is prepared for: 1, 2, 4, ... BATCH_SIZE (a power of two)
+BATCH_SIZES = tuple(1 << i for i in range(BATCH_SIZE.bit_length()))
+
+_batch_queue = queue.Queue()
+_batch_worker_pid = None
+_batch_worker_lock = threading.Lock()
+
+def _batch_loop():
+    """Owns the model: drains up to BATCH_SIZE queued requests and runs them as one batch."""
+    # Reused for every batch; only this thread touches it
+    batch_buf = np.empty((BATCH_SIZE, *INPUT_SHAPE[1:]), dtype=np.float32)
+    while True:
+        batch = [_batch_queue.get()]
+        deadline = time.monotonic() + BATCH_WAIT
+        while len(batch) < BATCH_SIZE:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(_batch_queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+
+        try:
+            # Padding rows hold stale data; their outputs are never read
+            inputs = batch_buf[:padded_batch_size(len(batch))]
+            np.concatenate([slot['input'] for slot in batch], out=inputs[:len(batch)])
+            predictions = run_inference(inputs)
+            for i, slot in enumerate(batch):
+                slot['result'] = predictions[i:i + 1]
+        except Exception as e:
+            for slot in batch:
+                slot['error'] = e
+        for slot in batch:
+            slot['event'].set()
+
+def _ensure_batch_worker():
+    # Started lazily and per process: threads don't survive a fork
+    global _batch_worker_pid
+    with _batch_worker_lock:
+        if _batch_worker_pid != os.getpid():
+            threading.Thread(target=_batch_loop, name='inference-batcher', daemon=True).start()
+            _batch_worker_pid = os.getpid()
+
+def run_batched_inference(img_array):
+    """Queues a single-image batch for the batching worker and waits for its row."""
+    _ensure_batch_worker()
+    slot = {'input': img_array, 'event': threading.Event()}
+    _batch_queue.put(slot)
+    slot['event'].wait()
+    if 'error' in slot:
+        raise slot['error']
+    return slot['result']
+
+# ─── PREPROCESSING (Single fused TF graph, see preprocessing.py) ─────────────
+# Trace once at import so the first request doesn't pay for it
+decode_and_preprocess = preprocessing.decode_and_preprocess.get_concrete_function()
+
+WARMUP_RUNS = 3
+
+def warm_up_model():
+    """Runs synthetic inputs through preprocessing and the model so kernels and arenas are ready."""
+    dummy_jpeg = tf.io.encode_jpeg(tf.zeros((*IMG_SIZE, 3), dtype=tf.uint8))
+    _, img_array = decode_and_preprocess(dummy_jpeg)
+    dummy = img_array.numpy()
+    for _ in range(WARMUP_RUNS):
+        run_inference(dummy.copy())
+    # Compile (XLA) / prepare (XNNPACK) every padded batch size the micro-batcher can produce
+    for size in BATCH_SIZES[1:]:
+        run_inference(np.zeros((size, *INPUT_SHAPE[1:]), dtype=np.float32))
+    print(f"Model warmed up ({WARMUP_RUNS} runs)")
+
+# ─── CLINICAL TEXT (Shared, immutable across requests) ──────────────────────
+HEALTHY_STAGE = ("N/A", "Tissue shows no signs of active pathogen colonization.")
+HEALTHY_RECS = (
+    "Continue regular watering and care",
+    "Monitor for any changes in appearance",
+    "Maintain good air circulation"
+)
+
+# Indexed by confidence band: <70%, 70-90%, >=90%
+SEVERITY_STAGES = (
+    ("Stage 1: Incubation / Early Detection", "Minimal necrotic tissue. Pathogen is in early colonization phase."),
+    ("Stage 2: Active Lesion Progression", "Significant pathogen activity. Lesions are expanding."),
+    ("Stage 3/4: Advanced Necrosis", "Critical tissue damage. High risk of secondary spread.")
+)
+
+@lru_cache(maxsize=None)
+def treatment_recs(pathogen_category):
+    return (
+        "Isolate affected plants immediately",
+        f"Apply appropriate {pathogen_category} treatment",
+        "Sanitize all tools used on this plant",
+        "Remove and safely dispose of heavily infected leaves"
+    )
 
 # ─── THE PREDICTION ENGINE (Unpacks 4 values) ───────────────────────────────
-def predict_image(filepath):
-    if model is None:
+def predict_image(img_array):
+    """Classifies a preprocessed float32 batch of shape INPUT_SHAPE."""
+    if model is None and not interpreters:
         raise ValueError("Model not loaded")
 
-    with Image.open(filepath) as img:
-        img_rgb = img.convert('RGB')
-        img_resized = img_rgb.resize(IMG_SIZE)
-        img_array = np.array(img_resized)
-    
-    img_array = np.expand_dims(img_array, axis=0)
-    img_array = preprocess_input(img_array.astype(np.float32))
-    
-    predictions = model.predict(img_array, verbose=0)
-    predicted_idx = int(np.argmax(predictions[0]))
-    confidence = float(np.max(predictions[0])) * 100
+    pred = run_batched_inference(img_array)[0]
+    predicted_idx = int(pred.argmax())
+    confidence = float(pred[predicted_idx]) * 100
+
+    if predicted_idx < len(class_names):
+        raw_class = class_names[predicted_idx]
+        meta = class_meta[predicted_idx]
+    else:
+        raw_class = "Unknown"
+        meta = parse_class_name(raw_class)
 
-    raw_class = class_names[predicted_idx] if predicted_idx < len(class_names) else "Unknown"
-    
     # Correctly unpacking 4 values to prevent errors
-    plant_type, condition, pathogen_category, is_healthy = parse_class_name(raw_class)
+    plant_type, condition, pathogen_category, is_healthy = meta
 
-    recommendations = []
     if is_healthy:
-        severity_stage = "N/A"
-        clinical_note = "Tissue shows no signs of active pathogen colonization."
-        recommendations = [
-            "Continue regular watering and care",
-            "Monitor for any changes in appearance",
-            "Maintain good air circulation"
-        ]
+        severity_stage, clinical_note = HEALTHY_STAGE
+        recommendations = HEALTHY_RECS
     else:
-        if confidence < 70:
-            severity_stage = "Stage 1: Incubation / Early Detection"
-            clinical_note = "Minimal necrotic tissue. Pathogen is in early colonization phase."
-        elif 70 <= confidence < 90:
-            severity_stage = "Stage 2: Active Lesion Progression"
-            clinical_note = "Significant pathogen activity. Lesions are expanding."
-        else:
-            severity_stage = "Stage 3/4: Advanced Necrosis"
-            clinical_note = "Critical tissue damage. High risk of secondary spread."
-        
-        recommendations = [
-            "Isolate affected plants immediately",
-            f"Apply appropriate {pathogen_category} treatment",
-            "Sanitize all tools used on this plant",
-            "Remove and safely dispose of heavily infected leaves"
-        ]
+        band = 0 if confidence < 70 else 1 if confidence < 90 else 2
+        severity_stage, clinical_note = SEVERITY_STAGES[band]
+        recommendations = treatment_recs(pathogen_category)
 
     return {
         'raw_class': raw_class,
@@ -212,44 +458,129 @@ def get_live_risk(pathogen_type, location="Hyderabad"):
         print(f"Weather API Error: {e}")
         return None
 
+def check_image_header(image_bytes):
+    """Reads only the image header; returns an error message if the upload must be rejected."""
+    try:
+        with Image.open(io.BytesIO(image_bytes)) as img:
+            width, height = img.size
+    except Image.DecompressionBombError:
+        return "Image dimensions are too large"
+    except (UnidentifiedImageError, OSError):
+        return "Unsupported or corrupt image file"
+    if width * height > MAX_IMAGE_PIXELS:
+        return "Image dimensions are too large"
+    return None
+
+def strip_jpeg_metadata(data):
+    """Returns the JPEG without metadata segments or trailing data, or None if it can't be parsed."""
+    out = [data[:2]]
+    i = 2
+    while i + 4 <= len(data):
+        if data[i] != 0xFF:
+            return None
+        marker = data[i + 1]
+        if marker == 0xFF:  # fill byte
+            i += 1
+            continue
+        if marker == 0xDA:  # start of scan: image data runs to EOI
+            end = data.find(b'\xff\xd9', i)
+            if end < 0:
+                return None
+            out.append(data[i:end + 2])
+            return b''.join(out)
+        length = int.from_bytes(data[i + 2:i + 4], 'big')
+        is_metadata = (0xE0 <= marker <= 0xEF and marker not in JPEG_KEPT_APP_MARKERS) or marker == 0xFE
+        if not is_metadata:
+            out.append(data[i:i + 2 + length])
+        i += 2 + length
+    return None
+
 @app.route('/predict', methods=['POST'])
 def predict():
     if 'file' not in request.files: return jsonify({'error': 'No file'}), 400
     file = request.files['file']
     if file:
-        filename = secrets.token_hex(8) + os.path.splitext(file.filename)[1]
-        filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-        file.save(filepath)
+        image_bytes = file.read()
+        # Checked before decoding: decode_image has no pixel limit of its own
+        error = check_image_header(image_bytes)
+        if error: return jsonify({'error': error}), 400
         try:
-            prediction = predict_image(filepath)
+            # Decoded once in memory; the upload is never written to disk as-is
+            decoded, img_array = decode_and_preprocess(tf.constant(image_bytes))
+            prediction = predict_image(img_array.numpy())
             weather_data = get_live_risk(prediction['pathogen_category'])
             prediction['weather_risk'] = weather_data
-            static_filename = f"upload_{secrets.token_hex(8)}.jpg"
+            static_filename = f"upload_{os.urandom(8).hex()}.jpg"
             static_path = os.path.join(app.config['STATIC_FOLDER'], static_filename)
-            with Image.open(filepath) as img:
-                img.convert('RGB').save(static_path)
-            session['prediction'] = prediction
+            # Already a JPEG: publish the uploaded bytes, minus EXIF/GPS, instead of re-encoding
+            stripped = strip_jpeg_metadata(image_bytes) if image_bytes.startswith(JPEG_MAGIC) else None
+            if stripped is not None:
+                with open(static_path, 'wb') as f:
+                    f.write(stripped)
+            else:
+                tf.io.write_file(static_path, tf.io.encode_jpeg(decoded, quality=85))
+            session['pred_tok'] = PREDICTIONS.add(prediction)
             session['image_path'] = f'images/{static_filename}'
-            os.remove(filepath)
             return jsonify({'success': True})
         except Exception as e:
             return jsonify({'error': str(e)}), 500
 
 @app.route('/result')
 def result():
-    prediction = session.get('prediction')
+    prediction = get_session_prediction()
     image_path = session.get('image_path')
     if not prediction: return redirect(url_for('upload'))
     return render_template('result.html', prediction=prediction, image_path=image_path)
 
-@app.route('/report')
-def report():
-    prediction = session.get('prediction')
-    if not prediction: return redirect(url_for('upload'))
-    
+# ─── BACKGROUND REPORTS (LLM call + PDF off the request thread) ─────────────
+REPORT_EXECUTOR = ThreadPoolExecutor(max_workers=8, thread_name_prefix='report')
+# Finished jobs hold a whole PDF (with the embedded upload): expire them, and drop on download
+REPORT_JOBS = TokenStore(maxsize=256, ttl=600)
+# Unfinished jobs keep running (and holding their PDF) even once evicted from REPORT_JOBS,
+# so the executor's otherwise unbounded queue is capped here
+MAX_PENDING_REPORTS = 16
+
+_pending_reports = {}  # pred_tok -> report token, for jobs that haven't finished
+_pending_reports_lock = threading.Lock()
+
+def _report_finished(pred_tok):
+    with _pending_reports_lock:
+        _pending_reports.pop(pred_tok, None)
+
+# ─── SCIENTIFIC DATA CACHE (One Groq call per diagnosis, shared by workers) ──
+SCI_CACHE_PATH = os.path.join(tempfile.gettempdir(), 'plantai_sci.sqlite3')
+
+def _sci_cache_connect():
+    conn = sqlite3.connect(SCI_CACHE_PATH, timeout=5)
+    conn.execute("CREATE TABLE IF NOT EXISTS sci_data (key TEXT PRIMARY KEY, value BLOB)")
+    return conn
+
+def _sci_cache_get(key):
+    try:
+        with closing(_sci_cache_connect()) as conn:
+            row = conn.execute("SELECT value FROM sci_data WHERE key = ?", (key,)).fetchone()
+        return orjson.loads(row[0]) if row else None
+    except (sqlite3.Error, orjson.JSONDecodeError) as e:
+        print(f"Sci Cache Error: {e}")
+        return None
+
+def _sci_cache_set(key, value):
+    try:
+        with closing(_sci_cache_connect()) as conn, conn:
+            conn.execute("INSERT OR REPLACE INTO sci_data (key, value) VALUES (?, ?)", (key, orjson.dumps(value)))
+    except sqlite3.Error as e:
+        print(f"Sci Cache Error: {e}")
+
+def get_sci_data(plant_type, condition):
+    """Returns the AI scientific data for a diagnosis, calling Groq only on a cache miss."""
+    cache_key = f"{plant_type}|{condition}"
+    sci_data = _sci_cache_get(cache_key)
+    if sci_data is not None:
+        return sci_data
+
     # Ask AI for data - specifically requesting strings
     scientific_query = (
-    f"Provide a research-grade analysis for {prediction['condition']} on {prediction['plant_type']}. "
+    f"Provide a research-grade analysis for {condition} on {plant_type}. "
     "Return ONLY a JSON object. "
     "For the 'taxonomy' key, you MUST provide a list of exactly 5 strings in 'Rank: Name' format "
     "(e.g., ['Kingdom: Fungi', 'Division: Basidiomycota', 'Class: Pucciniomycetes', 'Order: Pucciniales', 'Family: Pucciniaceae']). "
@@ -262,34 +593,84 @@ def report():
             messages=[{"role": "user", "content": scientific_query}],
             response_format={ "type": "json_object" }
         )
-        sci_data = json.loads(response.choices[0].message.content)
+        sci_data = orjson.loads(response.choices[0].message.content)
 
         # CRITICAL FIX: Ensure lists are converted to strings to prevent the .split() error
-        for key in ['organic_protocol', 'chemical_protocol', 'mechanism', 'spread_pattern']:
-            val = sci_data.get(key, "N/A")
+        for key in ('organic_protocol', 'chemical_protocol', 'mechanism', 'spread_pattern'):
+            val = sci_data.get(key)
             if isinstance(val, list):
                 sci_data[key] = "<br/>".join(val)
-            elif val is None:
+            elif val is None and key in sci_data:
                 sci_data[key] = "N/A"
     except Exception as e:
+        # Fallback is not cached so the next report retries the AI
         print(f"AI Fetch Error: {e}")
-        sci_data = {"pathogen_name": "N/A", "taxonomy": [], "organic_protocol": "N/A", "chemical_protocol": "N/A"}
+        return {"pathogen_name": "N/A", "taxonomy": [], "organic_protocol": "N/A", "chemical_protocol": "N/A"}
+
+    _sci_cache_set(cache_key, sci_data)
+    return sci_data
 
-    full_image_path = os.path.join(BASE_DIR, 'static', session.get('image_path'))
+def _build_report(prediction, image_path):
+    """Fetches the AI scientific data and renders the PDF; runs on REPORT_EXECUTOR.
+
+    Returns (download_name, pdf_buf) with the buffer rewound, ready for send_file.
+    """
+    sci_data = get_sci_data(prediction['plant_type'], prediction['condition'])
+
+    full_image_path = os.path.join(BASE_DIR, 'static', image_path)
     
-    pdf_bytes = generate_enhanced_report(
+    pdf_buf = io.BytesIO()
+    generate_enhanced_report(
         prediction=prediction,
         sci_data=sci_data,
-        image_path=full_image_path
+        image_path=full_image_path,
+        out=pdf_buf
     )
-    
-    return send_file(io.BytesIO(pdf_bytes), mimetype='application/pdf', as_attachment=True, 
-                     download_name=f"Scientific_Report_{prediction['plant_type']}.pdf")
+    pdf_buf.seek(0)
+    return f"Scientific_Report_{prediction['plant_type']}.pdf", pdf_buf
+
+@app.route('/report', methods=['POST'])
+def report():
+    prediction = get_session_prediction()
+    if not prediction: return jsonify({'error': 'No prediction'}), 400
+
+    pred_tok = session.get('pred_tok')
+    with _pending_reports_lock:
+        # Repeated clicks for the same diagnosis share the job already running
+        token = _pending_reports.get(pred_tok)
+        if token is not None: return jsonify({'token': token})
+        if len(_pending_reports) >= MAX_PENDING_REPORTS:
+            return jsonify({'error': 'Too many reports are being generated. Please try again shortly.'}), 503, {'Retry-After': '10'}
+
+        future = REPORT_EXECUTOR.submit(_build_report, dict(prediction), session.get('image_path'))
+        token = REPORT_JOBS.add(future)
+        _pending_reports[pred_tok] = token
+    # Outside the lock: runs immediately if the job has already finished
+    future.add_done_callback(lambda _: _report_finished(pred_tok))
+    return jsonify({'token': token})
+
+@app.route('/report/<token>')
+def report_download(token):
+    future = REPORT_JOBS.get(token)
+    if future is None: return jsonify({'error': 'Unknown or expired report'}), 404
+    if not future.done(): return jsonify({'status': 'pending'}), 202
+
+    try:
+        download_name, pdf_buf = future.result()
+    except Exception as e:
+        REPORT_JOBS.pop(token)
+        return jsonify({'error': str(e)}), 500
+
+    # HEAD is the client's readiness poll; only the real download consumes the job
+    if request.method == 'HEAD': return Response(status=200, mimetype='application/pdf')
+    REPORT_JOBS.pop(token)
+    return send_file(pdf_buf, mimetype='application/pdf', as_attachment=True, 
+                     download_name=download_name)
 # ─── AI CHATBOT LOGIC ────────────────────────────────────────────────────────
 
 @app.route('/learn', methods=['POST'])
 def learn():
-    prediction = session.get('prediction')
+    prediction = get_session_prediction()
     if not prediction: return jsonify({'error': 'No prediction'}), 400
     
     panel = request.json.get('panel', 'overview')
@@ -311,9 +692,12 @@ def learn():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+# Line breaks inside a token would end the SSE frame early; the client unescapes them
+SSE_ESCAPES = str.maketrans({'\n': '\\n', '\r': '\\r'})
+
 @app.route('/chat', methods=['POST'])
 def chat():
-    prediction = session.get('prediction')
+    prediction = get_session_prediction()
     if not prediction: return jsonify({'error': 'No prediction'}), 400
     
     messages = request.json.get('messages', [])
@@ -328,12 +712,12 @@ def chat():
         )
         for chunk in stream:
             text = chunk.choices[0].delta.content
-            if text: yield f"data: {text.replace('\n', '\\n')}\n\n"
-        yield "data: [DONE]\n\n"
+            if text: yield f"data: {text.translate(SSE_ESCAPES)}\n\n".encode()
+        yield b"data: [DONE]\n\n"
 
     return Response(stream_with_context(generate()), mimetype='text/event-stream')
 
 load_model_and_classes()
 
 if __name__ == '__main__':
-    app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
+    app.run(debug=False, host='0.0.0.0', port=5000)
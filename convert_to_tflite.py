@@ -0,0 +1,94 @@
+import os
+import argparse
+import random
+import numpy as np
+from tensorflow.keras.models import load_model
+import tensorflow as tf
+
+from preprocessing import decode_and_preprocess
+
+# Configuration
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+MODEL_PATH = os.path.join(BASE_DIR, 'mobilenetv2_best.keras')
+TFLITE_MODEL_PATH = os.path.join(BASE_DIR, 'mobilenetv2_int8.tflite')
+# PlantVillage ("New Plant Diseases Dataset(Augmented)") splits, one subfolder per class
+TRAIN_DIR = os.environ.get('PLANTVILLAGE_TRAIN_DIR', os.path.join(BASE_DIR, 'dataset', 'train'))
+VALID_DIR = os.environ.get('PLANTVILLAGE_VALID_DIR', os.path.join(BASE_DIR, 'dataset', 'valid'))
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+
+# ─── DATA ───────────────────────────────────────────────────────────────────
+def sample_images(directory, count, seed=0):
+    """Returns `count` image paths sampled across the class subfolders of `directory`."""
+    paths = sorted(
+        os.path.join(root, name)
+        for root, _, files in os.walk(directory)
+        for name in files if name.lower().endswith(IMAGE_EXTENSIONS)
+    )
+    if not paths:
+        raise RuntimeError(f"No images found in {directory}")
+    random.Random(seed).shuffle(paths)
+    return paths[:count]
+
+def load_image(path):
+    """Preprocesses an image file with the same graph the app serves with."""
+    with open(path, 'rb') as f:
+        _, img_array = decode_and_preprocess(tf.constant(f.read()))
+    return img_array.numpy()
+
+# ─── ACCURACY CHECK ─────────────────────────────────────────────────────────
+def top1_agreement(tflite_model, model, paths):
+    """Fraction of images where the INT8 model's top-1 class matches the FP32 model's."""
+    interpreter = tf.lite.Interpreter(model_content=tflite_model)
+    interpreter.allocate_tensors()
+    input_details = interpreter.get_input_details()[0]
+    output_details = interpreter.get_output_details()[0]
+    scale, zero_point = input_details['quantization']
+
+    matches = 0
+    for path in paths:
+        img_array = load_image(path)
+        expected = int(model(img_array, training=False).numpy()[0].argmax())
+
+        quantized = np.clip(np.rint(img_array / scale + zero_point), -128, 127).astype(np.int8)
+        interpreter.set_tensor(input_details['index'], quantized)
+        interpreter.invoke()
+        matches += int(interpreter.get_tensor(output_details['index'])[0].argmax()) == expected
+    return matches / len(paths)
+
+# ─── CONVERSION ─────────────────────────────────────────────────────────────
+def convert(calibration_dir, eval_dir, num_calibration, num_eval, min_agreement):
+    model = load_model(MODEL_PATH)
+    calibration_paths = sample_images(calibration_dir, num_calibration)
+    print(f"Calibrating on {len(calibration_paths)} images from {calibration_dir}")
+
+    def representative_dataset():
+        """Yields preprocessed leaf images so the converter can pick INT8 ranges."""
+        for path in calibration_paths:
+            yield [load_image(path)]
+
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    converter.representative_dataset = representative_dataset
+    converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+    converter.inference_input_type = tf.int8
+    tflite_model = converter.convert()
+
+    eval_paths = sample_images(eval_dir, num_eval, seed=1)
+    agreement = top1_agreement(tflite_model, model, eval_paths)
+    print(f"Top-1 agreement with FP32 model: {agreement:.2%} on {len(eval_paths)} images from {eval_dir}")
+    if agreement < min_agreement:
+        raise SystemExit(f"Agreement below {min_agreement:.2%}; not writing {TFLITE_MODEL_PATH}")
+
+    with open(TFLITE_MODEL_PATH, 'wb') as f:
+        f.write(tflite_model)
+    print(f"Saved INT8 model to {TFLITE_MODEL_PATH} ({len(tflite_model) / 1e6:.1f} MB)")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Quantize mobilenetv2_best.keras to an INT8 TFLite model.")
+    parser.add_argument('--calibration-dir', default=TRAIN_DIR, help="PlantVillage train split (class subfolders)")
+    parser.add_argument('--eval-dir', default=VALID_DIR, help="PlantVillage valid split used for the agreement check")
+    parser.add_argument('--num-calibration', type=int, default=100)
+    parser.add_argument('--num-eval', type=int, default=500)
+    parser.add_argument('--min-agreement', type=float, default=0.97)
+    args = parser.parse_args()
+    convert(args.calibration_dir, args.eval_dir, args.num_calibration, args.num_eval, args.min_agreement)
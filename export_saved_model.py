@@ -0,0 +1,17 @@
+import os
+from tensorflow.keras.models import load_model
+
+# Configuration
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+MODEL_PATH = os.path.join(BASE_DIR, 'mobilenetv2_best.keras')
+SAVED_MODEL_PATH = os.path.join(BASE_DIR, 'mobilenetv2_sm')
+
+# ─── EXPORT ─────────────────────────────────────────────────────────────────
+def export():
+    """Exports the Keras model as a SavedModel with a serving_default signature."""
+    model = load_model(MODEL_PATH)
+    model.export(SAVED_MODEL_PATH)
+    print(f"Saved SavedModel to {SAVED_MODEL_PATH}")
+
+if __name__ == '__main__':
+    export()
@@ -0,0 +1,19 @@
+import os
+
+# Usage: gunicorn -c gunicorn.conf.py wsgi:app
+
+bind = os.environ.get('BIND', '0.0.0.0:5000')
+
+# Predictions and report jobs live in per-process stores: keep this at 1 unless
+# sticky sessions are in place (README, "Deployment constraints").
+workers = int(os.environ.get('WEB_CONCURRENCY', 1))
+
+# Threads rather than gevent: inference, the micro-batching queue and the report
+# pool are real threads, and TF calls would block a gevent hub while they run.
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS', 8))
+timeout = 120
+
+# No preload_app: the TF runtime is not fork-safe, so the master never imports the
+# app and each worker starts TF and loads the model itself.
+os.environ.setdefault('INFERENCE_THREADS', str(max(1, (os.cpu_count() or 1) // workers)))
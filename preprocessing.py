@@ -0,0 +1,16 @@
+import tensorflow as tf
+
+IMG_SIZE = (224, 224)
+
+# ─── PREPROCESSING (Single fused TF graph) ──────────────────────────────────
+# Shared by the app and convert_to_tflite.py so INT8 calibration sees exactly
+# the inputs served in production. Traced lazily: importing this module does
+# not start the TF runtime.
+@tf.function(input_signature=[tf.TensorSpec([], tf.string)])
+def decode_and_preprocess(image_bytes):
+    """Decodes, resizes and normalizes (MobileNetV2: x/127.5 - 1) in one graph."""
+    img = tf.io.decode_image(image_bytes, channels=3, expand_animations=False)
+    # Antialiased like the original PIL resize, so large phone photos are area-filtered
+    # rather than point-sampled; emits float32 with the batch axis in place, ready for the model
+    resized = tf.image.resize(tf.expand_dims(img, 0), IMG_SIZE, method='bilinear', antialias=True)
+    return img, resized / 127.5 - 1.0
@@ -1,8 +1,8 @@
-import io, os
+import os
 from datetime import datetime
 from reportlab.lib import colors
 from reportlab.lib.pagesizes import A4
-from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+from reportlab.lib.styles import ParagraphStyle
 from reportlab.lib.units import cm
 from reportlab.platypus import (
     SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, Image, 
@@ -16,29 +16,27 @@ ACCENT = colors.HexColor("#F0F7F4")
 DANGER = colors.HexColor("#941B0C")
 TEXT_BODY = colors.HexColor("#333333")
 
+# Custom Styles - built once per process, shared read-only by every report
+TITLE_STYLE = ParagraphStyle('Title', fontSize=20, textColor=colors.white, alignment=1, fontName='Helvetica-Bold', leading=24)
+H1_STYLE = ParagraphStyle('H1', fontSize=14, fontName='Helvetica-Bold', textColor=PRIMARY, spaceBefore=15, spaceAfter=10)
+LABEL_STYLE = ParagraphStyle('Label', fontSize=9, fontName='Helvetica-Bold', textColor=SECONDARY)
+VAL_STYLE = ParagraphStyle('Value', fontSize=10, textColor=TEXT_BODY, leading=14)
+WRAP_STYLE = ParagraphStyle('Wrap', fontSize=10, leading=15, textColor=TEXT_BODY, alignment=0)
+FOOTER_STYLE = ParagraphStyle('Footer', fontSize=8, alignment=1, textColor=colors.grey)
+
 class HorizontalLine(Flowable):
     def draw(self):
         self.canv.setStrokeColor(PRIMARY)
         self.canv.setLineWidth(1)
         self.canv.line(0, 0, 480, 0)
 
-def generate_enhanced_report(prediction, sci_data, image_path):
-    buf = io.BytesIO()
-    doc = SimpleDocTemplate(buf, pagesize=A4, rightMargin=1.5*cm, leftMargin=1.5*cm, topMargin=1.5*cm, bottomMargin=1.5*cm)
+def generate_enhanced_report(prediction, sci_data, image_path, out):
+    """Builds the PDF straight into the file-like object `out` and returns it."""
+    doc = SimpleDocTemplate(out, pagesize=A4, rightMargin=1.5*cm, leftMargin=1.5*cm, topMargin=1.5*cm, bottomMargin=1.5*cm)
     story = []
-    
-    styles = getSampleStyleSheet()
-    
-    # Custom Styles
-    title_style = ParagraphStyle('Title', fontSize=20, textColor=colors.white, alignment=1, fontName='Helvetica-Bold', leading=24)
-    h1 = ParagraphStyle('H1', fontSize=14, fontName='Helvetica-Bold', textColor=PRIMARY, spaceBefore=15, spaceAfter=10)
-    label_style = ParagraphStyle('Label', fontSize=9, fontName='Helvetica-Bold', textColor=SECONDARY)
-    val_style = ParagraphStyle('Value', fontSize=10, textColor=TEXT_BODY, leading=14)
-    wrap_style = ParagraphStyle('Wrap', fontSize=10, leading=15, textColor=TEXT_BODY, alignment=0)
-    footer_style = ParagraphStyle('Footer', fontSize=8, alignment=1, textColor=colors.grey)
 
     # 1. Header (Clean & Bold)
-    header_data = [[Paragraph("PHYTOSANITARY ANALYSIS REPORT", title_style)]]
+    header_data = [[Paragraph("PHYTOSANITARY ANALYSIS REPORT", TITLE_STYLE)]]
     header_tab = Table(header_data, colWidths=[doc.width])
     header_tab.setStyle(TableStyle([
         ('BACKGROUND', (0,0), (-1,-1), PRIMARY),
@@ -50,10 +48,10 @@ def generate_enhanced_report(prediction, sci_data, image_path):
 
     # 2. Metadata Grid
     meta_data = [
-        [Paragraph("SPECIMEN ID", label_style), Paragraph("ANALYSIS DATE", label_style), Paragraph("GENUS / SPECIES", label_style)],
-        [Paragraph(f"PLANT-AI-{datetime.now().strftime('%H%M%S')}", val_style), 
-         Paragraph(datetime.now().strftime("%B %d, %Y"), val_style), 
-         Paragraph(prediction.get('plant_type', 'N/A'), val_style)]
+        [Paragraph("SPECIMEN ID", LABEL_STYLE), Paragraph("ANALYSIS DATE", LABEL_STYLE), Paragraph("GENUS / SPECIES", LABEL_STYLE)],
+        [Paragraph(f"PLANT-AI-{datetime.now().strftime('%H%M%S')}", VAL_STYLE), 
+         Paragraph(datetime.now().strftime("%B %d, %Y"), VAL_STYLE), 
+         Paragraph(prediction.get('plant_type', 'N/A'), VAL_STYLE)]
     ]
     meta_tab = Table(meta_data, colWidths=[doc.width/3]*3)
     meta_tab.setStyle(TableStyle([('LEFTPADDING', (0,0), (-1,-1), 0), ('BOTTOMPADDING', (0,0), (-1,-1), 10)]))
@@ -61,10 +59,10 @@ def generate_enhanced_report(prediction, sci_data, image_path):
     story.append(HorizontalLine())
 
     # 3. Diagnosis Section
-    story.append(Paragraph("1. Primary Pathological Diagnosis", h1))
+    story.append(Paragraph("1. Primary Pathological Diagnosis", H1_STYLE))
     diag_data = [[
-        Paragraph(f"<b>Detected Condition:</b> <font color='#941B0C'>{prediction.get('condition', 'N/A').upper()}</font>", val_style),
-        Paragraph(f"<b>Confidence Score:</b> {prediction.get('confidence', 0)}%", val_style)
+        Paragraph(f"<b>Detected Condition:</b> <font color='#941B0C'>{prediction.get('condition', 'N/A').upper()}</font>", VAL_STYLE),
+        Paragraph(f"<b>Confidence Score:</b> {prediction.get('confidence', 0)}%", VAL_STYLE)
     ]]
     story.append(Table(diag_data, colWidths=[doc.width*0.65, doc.width*0.35]))
     
@@ -79,20 +77,20 @@ def generate_enhanced_report(prediction, sci_data, image_path):
                 ('BOX', (0,0), (-1,-1), 1, colors.grey),
             ]))
             story.append(img_tab)
-            story.append(Paragraph("<i>Fig 1.0: Optical specimen analysis.</i>", footer_style))
+            story.append(Paragraph("<i>Fig 1.0: Optical specimen analysis.</i>", FOOTER_STYLE))
         except: pass
 
     # 4. Scientific Taxonomy
-    story.append(Paragraph("2. Scientific Taxonomy & Mechanism", h1))
+    story.append(Paragraph("2. Scientific Taxonomy & Mechanism", H1_STYLE))
     
-    tax_data = [[Paragraph("TAXONOMIC RANK", label_style), Paragraph("CLASSIFICATION", label_style)]]
+    tax_data = [[Paragraph("TAXONOMIC RANK", LABEL_STYLE), Paragraph("CLASSIFICATION", LABEL_STYLE)]]
     tax_items = sci_data.get('taxonomy', [])
     if isinstance(tax_items, list) and len(tax_items) > 0:
         for item in tax_items:
             parts = item.split(":", 1) if ":" in item else ["Rank", item]
-            tax_data.append([Paragraph(parts[0].strip(), label_style), Paragraph(parts[1].strip(), val_style)])
+            tax_data.append([Paragraph(parts[0].strip(), LABEL_STYLE), Paragraph(parts[1].strip(), VAL_STYLE)])
     else:
-        tax_data.append([Paragraph("Pathogen Name", label_style), Paragraph(sci_data.get('pathogen_name', 'Verified'), val_style)])
+        tax_data.append([Paragraph("Pathogen Name", LABEL_STYLE), Paragraph(sci_data.get('pathogen_name', 'Verified'), VAL_STYLE)])
 
     tax_tab = Table(tax_data, colWidths=[4.5*cm, 11.5*cm])
     tax_tab.setStyle(TableStyle([
@@ -106,19 +104,19 @@ def generate_enhanced_report(prediction, sci_data, image_path):
     story.append(tax_tab)
     
     story.append(Spacer(1, 12))
-    story.append(Paragraph("<b>Pathogenesis Mechanism:</b>", label_style))
-    story.append(Paragraph(str(sci_data.get('mechanism', 'Analyzed via pattern recognition.')), wrap_style))
+    story.append(Paragraph("<b>Pathogenesis Mechanism:</b>", LABEL_STYLE))
+    story.append(Paragraph(str(sci_data.get('mechanism', 'Analyzed via pattern recognition.')), WRAP_STYLE))
 
     # 5. Treatment Protocols (New Page)
     story.append(PageBreak())
-    story.append(Paragraph("3. Phytosanitary Treatment Protocols", h1))
+    story.append(Paragraph("3. Phytosanitary Treatment Protocols", H1_STYLE))
     story.append(HorizontalLine())
     story.append(Spacer(1, 12))
     
     prot_data = [
-        [Paragraph("TREATMENT CATEGORY", label_style), Paragraph("APPLICATION GUIDELINES & DOSAGE", label_style)],
-        [Paragraph("<b>Organic / Biological</b>", label_style), Paragraph(str(sci_data.get('organic_protocol', 'N/A')), wrap_style)],
-        [Paragraph("<b>Chemical / Synthetic</b>", label_style), Paragraph(str(sci_data.get('chemical_protocol', 'N/A')), wrap_style)]
+        [Paragraph("TREATMENT CATEGORY", LABEL_STYLE), Paragraph("APPLICATION GUIDELINES & DOSAGE", LABEL_STYLE)],
+        [Paragraph("<b>Organic / Biological</b>", LABEL_STYLE), Paragraph(str(sci_data.get('organic_protocol', 'N/A')), WRAP_STYLE)],
+        [Paragraph("<b>Chemical / Synthetic</b>", LABEL_STYLE), Paragraph(str(sci_data.get('chemical_protocol', 'N/A')), WRAP_STYLE)]
     ]
     prot_tab = Table(prot_data, colWidths=[4.5*cm, 11.5*cm])
     prot_tab.setStyle(TableStyle([
@@ -134,20 +132,19 @@ def generate_enhanced_report(prediction, sci_data, image_path):
 
     # 6. Environmental Context (The Weather Flex)
     story.append(Spacer(1, 20))
-    story.append(Paragraph("4. Environmental Risk Context", h1))
+    story.append(Paragraph("4. Environmental Risk Context", H1_STYLE))
     weather_txt = (
         f"Based on current meteorological data for the region, "
         f"environmental factors are influencing the infection trajectory. "
         f"Proactive monitoring is advised."
     )
-    story.append(Paragraph(weather_txt, wrap_style))
+    story.append(Paragraph(weather_txt, WRAP_STYLE))
 
     # Final Footer
     story.append(Spacer(1, 40))
     story.append(HorizontalLine())
     story.append(Spacer(1, 5))
-    story.append(Paragraph("CONFIDENTIAL · Generated via PlantCare AI Neural Inference · Hyderabad, India", footer_style))
+    story.append(Paragraph("CONFIDENTIAL · Generated via PlantCare AI Neural Inference · Hyderabad, India", FOOTER_STYLE))
 
     doc.build(story)
-    buf.seek(0)
-    return buf.getvalue()
\ No newline at end of file
+    return out